@@ -1,15 +1,18 @@
 """ Defind and create a sawyer configuration
 
-Importing this loads configuration data for a sawyer project.By default,
+Importing this provides configuration data for a sawyer project (loaded
+the first time the 'conf' object is used). By default,
 configuration settings come from the 'sawyer_config' directory found
 either in the current working directory or its parent. A different
 directory location can be given and the configuration can be overwritten
 if desired. This should be imported to all sawyer modules that need access
 to project configuration
 
-Creates a 'conf' object (SawyerConfig class) containing:
+Creates a 'conf' object (SawyerConfig class, created on first use)
+containing:
     projectname (string): name of the project
     loggers (string list): name for each datalogger associated with project 
+    loggers_set (frozenset): logger names, for fast membership tests
     spath (string): path to configuration file
     defpaths (dict): default data paths specified in sawyer_conf.yaml
     userpaths (dict): user defined data paths specified in sawyer_conf.yaml
@@ -17,6 +20,8 @@ Creates a 'conf' object (SawyerConfig class) containing:
                       keys refer to the datatype/subdirectory, values are the 
                       full path to that subdirectory abstracted for logger name
                       replacement
+    resolved_paths (dict): datapaths with the logger name filled in, keyed
+                      by logger name and then datatype/subdirectory
     sitedata_file (string): path of a site metadata file with variables for
                       sites where loggers are located.
 
@@ -26,27 +31,150 @@ There are other things this should do:
 """
 
 import os
+import sys
+import re
+import copy
+import functools
 import warnings
-from ruamel.yaml import YAML 
-yaml=YAML(typ='safe')
 import pdb
 
+# YAML files are parsed with PyYAML's libyaml-backed CSafeLoader if available,
+# which is much faster than the pure-python loaders. Fall back to ruamel.yaml
+# if PyYAML is not installed.
+try:
+    import yaml as _pyyaml
+    _yaml_loader = getattr(_pyyaml, 'CSafeLoader', None)
+    if _yaml_loader is None:
+        warnings.warn('PyYAML was built without libyaml, YAML configuration '
+                'files will be parsed with the (slower) python loader')
+        _yaml_loader = _pyyaml.SafeLoader
+except ImportError:
+    _pyyaml = None
+    from ruamel.yaml import YAML
+    _ruamel_yaml = YAML(typ='safe')
+
+# PyYAML resolves plain scalars with YAML 1.1 rules (NO/on/yes are booleans,
+# 10:30 is a base 60 int, 010 is octal). ruamel.yaml uses YAML 1.2 rules,
+# where these stay strings (or decimal ints), so the PyYAML loader gets the
+# YAML 1.2 core schema bool/int/float resolvers (as in ruamel.yaml).
+_yaml12_resolvers = [
+    ('tag:yaml.org,2002:bool',
+        re.compile(r'''^(?:true|True|TRUE|false|False|FALSE)$''', re.X),
+        list('tTfF')),
+    ('tag:yaml.org,2002:float',
+        re.compile(r'''^(?:
+         [-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+]?[0-9]+)?
+        |[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)
+        |[-+]?\.[0-9_]+(?:[eE][-+][0-9]+)?
+        |[-+]?\.(?:inf|Inf|INF)
+        |\.(?:nan|NaN|NAN))$''', re.X),
+        list('-+0123456789.')),
+    ('tag:yaml.org,2002:int',
+        re.compile(r'''^(?:[-+]?0b[0-1_]+
+        |[-+]?0o?[0-7_]+
+        |[-+]?[0-9_]+
+        |[-+]?0x[0-9a-fA-F_]+)$''', re.X),
+        list('-+0123456789')),
+    ]
+
+def _construct_yaml12_int(loader, node):
+    """
+    Construct a YAML 1.2 int (leading zeros are decimal, 0o is octal)
+    """
+    value = loader.construct_scalar(node).replace('_', '')
+    sign = -1 if value[0] == '-' else 1
+    value = value.lstrip('+-')
+    for prefix, base in (('0b', 2), ('0o', 8), ('0x', 16)):
+        if value.startswith(prefix):
+            return sign * int(value[2:], base)
+    return sign * int(value)
+
+if _pyyaml is not None:
+    class _Yaml12Loader(_yaml_loader):
+        pass
+    _Yaml12Loader.yaml_implicit_resolvers = {
+            ch: [(tag, rexp) for tag, rexp in resolvers
+                if tag not in ('tag:yaml.org,2002:bool',
+                    'tag:yaml.org,2002:int', 'tag:yaml.org,2002:float')]
+            for ch, resolvers in _yaml_loader.yaml_implicit_resolvers.items()}
+    for tag, rexp, first in _yaml12_resolvers:
+        _Yaml12Loader.add_implicit_resolver(tag, rexp, first)
+    _Yaml12Loader.add_constructor('tag:yaml.org,2002:int',
+            _construct_yaml12_int)
+    _yaml_loader = _Yaml12Loader
+
+def load_yaml(stream):
+    """
+    Parse a YAML stream (an open file or a string) with a safe loader and
+    return the resulting python object
+    """
+    if _pyyaml is not None:
+        return _pyyaml.load(stream, Loader=_yaml_loader)
+    return _ruamel_yaml.load(stream)
+
+@functools.lru_cache(maxsize=64)
+def _load_yaml_cached(path, mtime_ns, size):
+    """
+    Parse a YAML file. Results are cached by path, modification time and
+    size, so a changed file is parsed again on the next call.
+    """
+    with open(path, 'r') as stream:
+        return load_yaml(stream)
+
+def load_yaml_file(path):
+    """
+    Load a YAML file, re-using the parsed result if the file has not changed
+    since it was last loaded. A copy is returned, so callers may modify it.
+    Set the SAWYER_YAML_CACHE_DEBUG environment variable to print cache
+    statistics.
+
+    Raises:
+        FileNotFoundError: if path does not exist
+    """
+    st = os.stat(path)
+    parsed = _load_yaml_cached(os.path.abspath(path), st.st_mtime_ns,
+            st.st_size)
+    if os.environ.get('SAWYER_YAML_CACHE_DEBUG'):
+        print('YAML cache ({0}): {1}'.format(path,
+            _load_yaml_cached.cache_info()))
+    return copy.deepcopy(parsed)
+
 # Initialize some default path names
 conf_dir_default = "sawyer_config"
 project_c_default = "project.yaml"
 logger_c_default = "loggers.yaml"
 
-# Get the project configuration path. If `sawyer_config` is in the cwd or its
-# parent, set that as the path and set the conf_flag. Otherwise, a basic,
-# "unspecified" configuration is loaded.
-if os.path.isfile(os.path.join(conf_dir_default, project_c_default)):
-    parent_spath = os.path.join(os.getcwd(), conf_dir_default)
-elif os.path.isfile(os.path.join('..', conf_dir_default, project_c_default)):
-    parent_spath = os.path.join(os.path.dirname(os.getcwd()), conf_dir_default)
-else:
-    parent_spath = None
-    warnings.warn('sawyer_config directory was not found in the current or' 
-            'parent directory')
+def _has_sawyer_config(path):
+    """
+    Check whether path contains a `sawyer_config` directory with a project
+    configuration file. Uses directory listings (os.scandir) rather than a
+    stat call per candidate path.
+    """
+    try:
+        with os.scandir(path) as it:
+            entry = next((e for e in it if e.name == conf_dir_default), None)
+        if entry is None or not entry.is_dir():
+            return False
+        with os.scandir(entry.path) as it:
+            return any(e.name == project_c_default and e.is_file()
+                    for e in it)
+    except OSError:
+        return False
+
+def find_parent_spath():
+    """
+    Get the project configuration path. If `sawyer_config` is in the cwd or
+    its parent, return that path. Otherwise return None, and a basic,
+    "unspecified" configuration will be loaded.
+    """
+    if _has_sawyer_config('.'):
+        return os.path.join(os.getcwd(), conf_dir_default)
+    elif _has_sawyer_config('..'):
+        return os.path.join(os.path.dirname(os.getcwd()), conf_dir_default)
+    else:
+        warnings.warn('sawyer_config directory was not found in the current or' 
+                'parent directory')
+        return None
 
 # Class for color terminal output
 class tcol:
@@ -71,6 +199,8 @@ class SawyerConfig(object):
         """
         self.import_uplots = False
         # Initialize path
+        if len(args) == 0:
+            parent_spath = find_parent_spath()
         if len(args) == 0 and parent_spath is None:
             print('No path given. Initializing empty sawyer configuration')
             self.spath = None
@@ -111,6 +241,7 @@ class SawyerConfig(object):
                     '(<path>)' + tcol.ENDC)
             self.projectname='Unspecified'
             self.loggers=[]
+            self.loggers_set=frozenset()
             self.logger_c={}
             self.spath=None
             self.rawpath=''
@@ -119,9 +250,11 @@ class SawyerConfig(object):
             self.userlevels={}
             self.userpaths={}
             self.datapaths={}
+            self.resolved_paths={}
             self.sitedata_file=''
             self.filename_dt_fmt = ''
             self.filename_dt_rexp = ''
+            self.filename_dt_cre = re.compile('')
         else:
             self.fetch_config()
             
@@ -135,14 +268,12 @@ class SawyerConfig(object):
             # Load the project yaml file
             yaml_file = os.path.join(spath, project_c_default)
             print("Project configs: {0}".format(yaml_file))
-            stream = open(yaml_file, 'r')
-            project_c = yaml.load(stream)
+            project_c = load_yaml_file(yaml_file)
 
             # Load the loggers yaml file
             yaml_file = os.path.join(spath, logger_c_default)
             print("Logger configs: {0}".format(yaml_file))
-            stream = open(yaml_file, 'r')
-            logger_c = yaml.load(stream)
+            logger_c = load_yaml_file(yaml_file)
 
             # Project name
             projectname = project_c['projectname']
@@ -205,6 +336,10 @@ class SawyerConfig(object):
             datapaths.update(defpaths)
             datapaths.update(userpaths)
 
+            # Fill in the logger name in each data path for every logger
+            resolved_paths = {ln: {k: v.replace('{LOGGER}', ln)
+                for k, v in datapaths.items()} for ln in loggers}
+
             # TODO - change this to get sawyer version
             # Sawyer code path
             #sawyer_py_path = os.path.join(base_path,
@@ -219,7 +354,6 @@ class SawyerConfig(object):
             # plots module).
             if os.path.isfile(os.path.join(spath, 'userplots.py')):
                 self.import_uplots=True
-                import sys
                 sys.path.append(spath)
 
             # Print available data subdirectories for user:
@@ -237,6 +371,7 @@ class SawyerConfig(object):
             #Assign all the public variables of the class
             self.projectname = projectname
             self.loggers = loggers
+            self.loggers_set = frozenset(loggers)
             self.logger_c = logger_c
             self.spath = spath
             self.rawpath = raw_path
@@ -245,15 +380,43 @@ class SawyerConfig(object):
             self.userlevels = userlevels
             self.userpaths = userpaths
             self.datapaths = datapaths
+            self.resolved_paths = resolved_paths
             #self.sawyer_py_path = sawyer_py_path
             self.sitedata_file = sitedata_file
             self.filename_dt_fmt = filename_dt_fmt
             self.filename_dt_rexp = filename_dt_rexp
+            self.filename_dt_cre = re.compile(filename_dt_rexp)
             
         except:
             # Warn that an invalid sawyer_config path was given
             warnings.warn('This is not a valid sawyer_config directory')
 
-# Create the SawyerConfig object
-conf = SawyerConfig()
-conf.get_config()
+class _LazyConf(object):
+    """
+    Placeholder for the module 'conf' object. The SawyerConfig object is
+    created, and the configuration fetched, the first time an attribute is
+    accessed, so importing sawyer modules does not read configuration files.
+    Attribute access is forwarded to the SawyerConfig object afterward.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_conf', None)
+
+    def _load(self):
+        conf = object.__getattribute__(self, '_conf')
+        if conf is None:
+            conf = SawyerConfig()
+            conf.get_config()
+            object.__setattr__(self, '_conf', conf)
+            # Later `sawyer.config.conf` lookups get the real object
+            sys.modules[__name__].conf = conf
+        return conf
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+# Create the SawyerConfig object (on first use)
+conf = _LazyConf()
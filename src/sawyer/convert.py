@@ -2,6 +2,7 @@
 A module of unit conversion functions that can be loaded to convert
 """
 import pandas as pd
+import numpy as np
 
 def co2_mol_to_C_mass_flux( df, n_seconds ) :
     """
@@ -14,21 +15,20 @@ def co2_mol_to_C_mass_flux( df, n_seconds ) :
         n_seconds: number of seconds to integrate in the conversion
 
     Returns:
-        df_int: an converted, integrated dataframe
+        df_int: an converted, integrated dataframe (a new dataframe, df is
+                not modified or copied)
 
     TODO
         1. Could be good to diff the index (n seconds per meas), then integrate,
         thus removing the seconds argument.
 
     """
-    # Initialize returned variables
-    df_int = df.copy()
-    export_cols = []
-    # For each input column create a new header and convert values to mass flux
-    for cname in df.columns :
-        export_cname = cname + '_g_int'
-        export_cols.append( export_cname )
-        # Integrate based on number of seconds
-        df_int[ export_cname ] = df_int[ cname ] * ( 12.011/1e+06 ) * n_seconds
+    # Create a new header for each input column
+    export_cols = [ cname + '_g_int' for cname in df.columns ]
+    # Convert all values to mass flux and integrate based on number of
+    # seconds in one array operation
+    vals = df.to_numpy( dtype=np.float64, copy=False )
+    df_int = pd.DataFrame( vals * ( 12.011/1e+06 * n_seconds ),
+            index=df.index, columns=export_cols )
 
-    return df_int[ export_cols ]
+    return df_int
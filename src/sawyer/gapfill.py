@@ -77,8 +77,8 @@ class GapfillSource:
             if enf is None:
                 enf = datetime.now()
             # Get the index range to be trimmed
-            idxrange = np.logical_and(source_df.index >= stf,
-                    source_df.index <= enf)
+            idxrange = ((source_df.index >= stf) &
+                    (source_df.index <= enf))
             for i, f in enumerate(source_list):
                 source_list[i] = source_list[i].loc[idxrange,:]
 
@@ -192,7 +192,7 @@ def apply_gapfilling(df_in, dlevel, gapconf, plot=False):
         if en is None:
             en = datetime.now()
         # Get the index range to be filled
-        fillidx = np.logical_and(df.index >= st, df.index <= en)
+        fillidx = (df.index >= st) & (df.index <= en)
 
         # Get the gapfilling function and arguments
         gffunc, gf_kwargs = get_gffunction(conf)
@@ -213,7 +213,7 @@ def apply_gapfilling(df_in, dlevel, gapconf, plot=False):
             # Run the gapfilling function
             df[col], gf_bool = gffunc(to_fill, fillidx, *gf_sources,
                     **gf_kwargs)
-            df_isfilled[col] = np.logical_or(gf_bool, df_isfilled[col])
+            df_isfilled[col] = gf_bool | df_isfilled[col].to_numpy()
 
         # Plot if requested
             if plot:
@@ -35,10 +35,11 @@ def fillna(y_gaps, fillidx, *args, **kwargs):
     https://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.fillna.html
     """
     source, fillidx = args[0], args[1]
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_new = y_gaps.copy()
     #return y_gaps.fillna(*args, **kwargs)
     y_new[fillidx] = y_gaps[fillidx].fillna(*args, **kwargs)
-    y_predict_fill = np.logical_and(fillidx, np.isnan(y_new))
+    y_predict_fill = fillidx & np.isnan(y_new.to_numpy())
     return y_new, y_predict_fill
 
 def interpolate(y_gaps, fillidx, *args, **kwargs):
@@ -51,10 +52,11 @@ def interpolate(y_gaps, fillidx, *args, **kwargs):
     
     https://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.interpolate.html
     """
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_new = y_gaps.copy()
     #return y_gaps.interpolate(*args, **kwargs)
     y_new[fillidx] = y_gaps[fillidx].interpolate(**kwargs)
-    y_predict_fill = np.logical_and(fillidx, np.isnan(y_new))
+    y_predict_fill = fillidx & np.isnan(y_new.to_numpy())
     return y_new, y_predict_fill
 
 def scipy_interp1d(y_gaps, fillidx, *args, **kwargs):
@@ -71,10 +73,11 @@ def scipy_interp1d(y_gaps, fillidx, *args, **kwargs):
     """
     import scipy.interpolate.interp1d as i1d
 
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_new = y_gaps.copy()
     #return y_gaps.interpolate(*args, **kwargs)
     y_new[fillidx] = y_gaps[fillidx].interpolate(**kwargs)
-    y_predict_fill = np.logical_and(fillidx, np.isnan(y_new))
+    y_predict_fill = fillidx & np.isnan(y_new.to_numpy())
     return y_new, y_predict_fill
 
 
@@ -92,7 +95,7 @@ def substitution(y_gaps, fillidx, *args, **kwargs):
     yx.columns = ['y', 'x']
     
     #commonidx = ~yx.isna().any(1)
-    gapfillidx = np.logical_and(~np.isnan(yx.x), np.isnan(xy.y))
+    gapfillidx = ~np.isnan(yx.x.to_numpy()) & np.isnan(yx.y.to_numpy())
 
     y_out[gapfillidx] = yx[gapfillidx].x
         
@@ -104,6 +107,7 @@ def midpoint(y_gaps, fillidx, *args, **kwargs):
     """
     
     source = args
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_out = y_gaps.copy()
 
     # Simple join - index checking done in gapfill.py and
@@ -111,12 +115,15 @@ def midpoint(y_gaps, fillidx, *args, **kwargs):
     xxy = source[0].join(source[1]).join(y_gaps)
     xxy.columns = ['x1', 'x2', 'y']
     #commonidx = ~yx.isna().any(1)
-    x1x2idx = np.logical_and(~np.isnan(xxy.x1), ~np.isnan(xxy.x2))
-    ypredict = np.logical_and(x1x2idx, np.isnan(xxy.y))
-    # Gapfill (constrained by fillidx)
-    ypredict_fill = np.logical_and(ypredict, fillidx)
+    # Y missing and X1, X2 present (and can be predicted), constrained by
+    # fillidx. Conditions are combined in place in one bool array
+    ypredict_fill = np.isnan(xxy.y.to_numpy())
+    ypredict_fill &= fillidx
+    ypredict_fill &= ~np.isnan(xxy.x1.to_numpy())
+    ypredict_fill &= ~np.isnan(xxy.x2.to_numpy())
     # Fill with mean of x1 and x2
-    y_out[ypredict_fill] = xxy.loc[ypredict_fill,['x1','x2']].mean(axis=1)
+    y_out[ypredict_fill] = xxy.loc[ypredict_fill,['x1','x2']].mean(
+            axis=1).to_numpy()
         
     return y_out, ypredict_fill
 
@@ -131,7 +138,8 @@ def linearfit(y_gaps, fillidx, *args, **kwargs):
     #set_trace()
     zero_intcpt = kwargs.get('zero_intcpt',False)
     # Should only be one source
-    x_src = args[0].copy()
+    x_src = args[0]
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_out = y_gaps.copy()
     
     # Simple join for regression - index checking done in gapfill.py and
@@ -140,31 +148,35 @@ def linearfit(y_gaps, fillidx, *args, **kwargs):
     xy.columns = ['x', 'y']
     
     # X and Y values present
-    commonidx = ~xy.isna().any(1)
+    commonidx = ~xy.isna().any(axis=1)
     # X present, Y missing (and can be predicted)
-    ypredict = np.logical_and(~np.isnan(xy.x), np.isnan(xy.y))
+    x = xy.x.to_numpy()
+    y = xy.y.to_numpy()
+    ypredict = pd.Series(~np.isnan(x) & np.isnan(y), index=xy.index)
     # Gapfill index (constrained by reindexed ypredict and fillidx)
     ypredict_reind = ypredict.reindex(y_gaps.index, fill_value=False)
-    ypredict_fill = np.logical_and(ypredict_reind, fillidx)
+    ypredict_fill = ypredict_reind.to_numpy() & fillidx
     # Get locations in xy to calculate fitted y values
-    xyfit_locs = ypredict_fill.index[ypredict_fill]
+    xyfit_locs = y_gaps.index[ypredict_fill]
+    # X and Y values for the regression, and X values to predict from
+    x_vals = xy.loc[commonidx, 'x'].to_numpy()
+    y_vals = xy.loc[commonidx, 'y'].to_numpy()
+    x_fit = xy.loc[xyfit_locs, 'x'].to_numpy()
     
     if zero_intcpt:
         # This is the least-squares solution for y=a*x (intercept of zero)
         # https://medium.com/@andrew.chamberlain/f67044b7f39b
         # https://machinelearningmastery.com/solve-linear-regression-using-linear-algebra/
-        coeff = (xy[commonidx].x.dot(xy[commonidx].y)/
-                xy[commonidx].x.dot(xy[commonidx].x))
+        coeff = x_vals.dot(y_vals) / x_vals.dot(x_vals)
         # Can also use numpy linear alg solver - should be equivalent
         # https://stackoverflow.com/a/9994484
-        x2 = xy[commonidx].x[:, np.newaxis]
-        y2 = xy[commonidx].y
-        coeff2, yint, _, _ = np.linalg.lstsq(x2, y2, rcond=None)
+        x2 = x_vals[:, np.newaxis]
+        coeff2, yint, _, _ = np.linalg.lstsq(x2, y_vals, rcond=None)
         # calculate predicted values
-        y_out[ypredict_fill] = xy.loc[xyfit_locs].x * coeff
+        y_out[ypredict_fill] = x_fit * coeff
     else:
-        coeff = np.polyfit(xy[commonidx].x, xy[commonidx].y, 1)
-        y_out[ypredict_fill] = np.polyval(coeff, xy.loc[xyfit_locs].x)
+        coeff = np.polyfit(x_vals, y_vals, 1)
+        y_out[ypredict_fill] = np.polyval(coeff, x_fit)
 
     return y_out, ypredict_fill
 
@@ -180,7 +192,8 @@ def linearfit2(y_gaps, fillidx, *args, **kwargs):
 
     zero_intcpt = kwargs.get('zero_intcpt',False)
     # Should only be one source
-    x_src = args[0].copy()
+    x_src = args[0]
+    fillidx = np.asarray(fillidx, dtype=bool)
     y_out = y_gaps.copy()
 
     # Simple join for regression - index checking done in gapfill.py and
@@ -188,20 +201,26 @@ def linearfit2(y_gaps, fillidx, *args, **kwargs):
     xy = x_src.join(y_gaps, lsuffix='x', rsuffix='y')
     xy.columns = ['x', 'y']
     
-    commonidx = ~xy.isna().any(1)
+    commonidx = ~xy.isna().any(axis=1)
     # X present, Y missing (and can be predicted)
-    ypredict = np.logical_and(~np.isnan(xy.x), np.isnan(xy.y))
+    x = xy.x.to_numpy()
+    y = xy.y.to_numpy()
+    ypredict = ~np.isnan(x) & np.isnan(y)
     # Gapfill (constrained by fillidx)
-    ypredict_fill = np.logical_and(ypredict, fillidx)
+    ypredict_fill = ypredict & fillidx
+
+    # X and Y values for the regression
+    x_vals = xy.loc[commonidx, 'x'].to_numpy()
+    y_vals = xy.loc[commonidx, 'y'].to_numpy()
 
     # Minimize slope m in this function (sum of squared errors)
     def sse_linfit_zero_intcpt(m, x, y):
-        return sum( ( y - ( m * x ) ) ** 2 )
+        return np.sum( ( y - ( m * x ) ) ** 2 )
         
     # Use scipy optimization tool to find slope
     coeff = sciop.fmin(func=sse_linfit_zero_intcpt, x0=1.1,
-            args=(xy[commonidx].x, xy[commonidx].y))
+            args=(x_vals, y_vals))
 
-    y_out[ypredict_fill] = xy[ypredict_fill].x * coeff
+    y_out[ypredict_fill] = xy.loc[ypredict_fill, 'x'].to_numpy() * coeff
 
     return y_out, ypredict_fill
@@ -8,15 +8,21 @@ import numpy as np
 import datetime as dt
 import pandas as pd
 import subprocess as sp
-from ruamel.yaml import YAML 
-yaml=YAML(typ='safe')
 import os
 import shutil
 import re
+import functools
+import itertools
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from sawyer.config import load_yaml_file
 import sawyer.config as sy
 sy = sy.conf # Get the conf part of configuration
 from IPython.core.debugger import set_trace
 
+# Data directories that get_datadir has already found or created
+_checked_dirs = set()
+
 def get_config(path):
     """
     Access the get_config method to change SawyerConfig configs from
@@ -32,7 +38,7 @@ def validate_logger(lname):
     Raises:
         ValueError
     """
-    if lname in sy.loggers:
+    if lname in sy.loggers_set:
         pass
     else:
         print('Available logger names are {0}'.format(sy.loggers))
@@ -53,38 +59,51 @@ def get_datadir(lname, datalevel='qa'):
     # Validate logger name, then find or create correct data directory
     validate_logger(lname)
     if datalevel in sy.datapaths.keys():
-        p = sy.datapaths[datalevel].replace('{LOGGER}', lname)
-        try:
-            os.makedirs(p)
-            print('New directory created: ' + p)
-        except FileExistsError:
-            # directory already exists
-            pass
+        p = sy.resolved_paths[lname][datalevel]
+        # Only check the filesystem the first time a directory is requested
+        if p not in _checked_dirs:
+            if not os.path.isdir(p):
+                os.makedirs(p, exist_ok=True)
+                print('New directory created: ' + p)
+            _checked_dirs.add(p)
     else:
         raise ValueError('Available data levels/directories are {0}'.format(
             sy.datapaths.keys()))
     return p
 
 def dt_from_filename(filename, rexp=None, fmt=None):
-    """
+    r"""
     Retrieve a datatime object from a given filename in sawyer format
 
     (\d{4}){1}([_-]\d{2}){5}
+
+    If the regexp has named groups for the datetime fields, for example
+    (?P<Y>\d{4})[_-](?P<m>\d{2})[_-](?P<d>\d{2})[_-](?P<H>\d{2})...
+    (Y, m, d and optional H, M, S), the datetime is built directly from the
+    matched groups and fmt is not used. Missing H/M/S groups default to 0.
     """
     if rexp is None:
-        rexp = sy.filename_dt_rexp
-    if fmt is None:
-        fmt = sy.filename_dt_fmt
+        # Use the regexp compiled when the configuration was loaded
+        cre = sy.filename_dt_cre
+    else:
+        cre = re.compile(rexp)
     # Regexp search
-    srchresult = re.search(rexp, filename)
+    srchresult = cre.search(filename)
     if srchresult is None:
         return None
+    elif 'Y' in cre.groupindex:
+        g = srchresult.groupdict()
+        return dt.datetime(int(g['Y']), int(g['m']), int(g['d']),
+                int(g.get('H') or 0), int(g.get('M') or 0),
+                int(g.get('S') or 0))
     else:
+        if fmt is None:
+            fmt = sy.filename_dt_fmt
         dtstr = srchresult.group(0)
         # Some files may be missing seconds - parse date anyway
         try:
             dtobj = dt.datetime.strptime(dtstr, fmt)
-        except:
+        except ValueError:
             dtobj = dt.datetime.strptime(dtstr, fmt[:-3])
         return dtobj
 
@@ -107,22 +126,27 @@ def get_file_list(datapath, optmatch=None, parsedt=False, fullpath=True):
         file_dt: list of datetime objects corresponding to items in files
                  (optional)
     """
-    # Get a list of filenames in provided data directory
-    filelist =  os.listdir(datapath) 
     # Match optional strings if given
     if isinstance(optmatch, str): # optmatch must be a list
         optmatch = [optmatch]
-    if optmatch is not None:
-        for m in optmatch:
-            filelist = [f for f in filelist if m in f]
-    # Create full path if requested
-    if fullpath:
-        files = [os.path.join(datapath, f) for f in filelist]
-    else:
-        files = filelist
-    # Parse dates if requested. Format specified in project configuration.
+    files, file_dt = ([], [])
+    # Scan the provided data directory once, keeping matching entries
+    with os.scandir(datapath) as it:
+        for entry in it:
+            if optmatch is not None and not all(
+                    m in entry.name for m in optmatch):
+                continue
+            # Use full path if requested
+            if fullpath:
+                files.append(entry.path)
+            else:
+                files.append(entry.name)
+            # Parse dates if requested. Format specified in project
+            # configuration.
+            if parsedt:
+                file_dt.append(dt_from_filename(entry.name))
     if parsedt:
-        return files, [dt_from_filename(f) for f in filelist]
+        return files, file_dt
     else:
         return files
 
@@ -137,8 +161,11 @@ def get_latest_file(datapath, optmatch=None, fullpath=True):
     if len(files) < 1:
         warn = "Warning: there are no files matching pattern {0} in {1}"
         print(warn.format(str(optmatch), datapath))
-    
-    return files[fdates.index(max(fdates))], max(fdates)
+
+    # Find the latest date in one pass, skipping unparseable filenames
+    idx, latest_dt = max(((i, d) for i, d in enumerate(fdates)
+        if d is not None), key=itemgetter(1))
+    return files[idx], latest_dt
 
     
 def get_latest_df(lname, datalevel, optmatch=None):
@@ -150,8 +177,11 @@ def get_latest_df(lname, datalevel, optmatch=None):
 
     if 'raw' in datalevel:
         raw_freq = sy.logger_c[lname]['rawfreq']
+        # Column dtypes may be given for the logger in loggers.yaml
+        iofunc = functools.partial(load_toa5,
+                dtypes=sy.logger_c[lname].get('dtypes'))
         fs, f_dt = get_file_list(p, optmatch=optmatch, parsedt=True)
-        df = concat_raw_files(fs, optmatch=optmatch, iofunc=load_toa5,
+        df = concat_raw_files(fs, optmatch=optmatch, iofunc=iofunc,
                 reindex=raw_freq)
     else:
         f, f_dt = get_latest_file(p, optmatch)
@@ -199,27 +229,26 @@ def read_yaml_conf(lname, yamltype, confdir=None):
     """
     if confdir is None:
         confdir = sy.spath
-    if lname is 'all':
+    if lname == 'all':
         yamlfile = os.path.join(confdir, yamltype + '.yaml')
     else:
         validate_logger(lname)
         yamlfile = os.path.join(confdir, lname, yamltype + '.yaml')
-    if os.path.isfile(yamlfile):
-        stream = open(yamlfile, 'r')
-        yamlf = yaml.load(stream)
-        ylogger = yamlf['meta']['logger']==lname
-        ytype = yamlf['meta']['conftype']==yamltype
-        if not(ylogger) or not(ytype):
-            raise ValueError('YAML file logger/type mismatch.')
-        else:
-            if yamlf['items'] is not None:
-                return yamlf['items']
-            else:
-                return {}
-    else:
+    try:
+        yamlf = load_yaml_file(yamlfile)
+    except FileNotFoundError:
         warn = "Warning: The requested YAML configuration ({0}) not present"
         print(warn.format(yamlfile))
         return dict()
+    ylogger = yamlf['meta']['logger']==lname
+    ytype = yamlf['meta']['conftype']==yamltype
+    if not(ylogger) or not(ytype):
+        raise ValueError('YAML file logger/type mismatch.')
+    else:
+        if yamlf['items'] is not None:
+            return yamlf['items']
+        else:
+            return {}
 
 
 def calculate_freq(idx):
@@ -233,7 +262,26 @@ def calculate_freq(idx):
     return str(round(cfreq)) + "min"
 
 
-def load_toa5(fdatapath, **kwargs) :
+def categorize_str_cols(df, max_ratio=0.5):
+    """
+    Convert string (object) columns with many repeated values (labels, ids,
+    flag categories, etc.) to the pandas categorical dtype. Equality tests
+    and sorting on categorical columns use small integer codes.
+
+    Args:
+        df (DataFrame): dataframe to convert (modified in place)
+        max_ratio (float): convert columns with fewer unique values than
+                           max_ratio * column length
+    Return:
+        df   : the dataframe with repetitive string columns converted
+    """
+    for c in df.select_dtypes(include=[object, 'string']).columns:
+        if df[c].nunique() < max_ratio * len(df[c]):
+            df[c] = df[c].astype('category')
+    return df
+
+
+def load_toa5(fdatapath, dtypes=None, **kwargs) :
     """
     Load a specified TOA5 datalogger file (a Campbell standard output format)
     and return a pandas DataFrame object. DataFrame has a datetime index
@@ -241,6 +289,10 @@ def load_toa5(fdatapath, **kwargs) :
 
     Args:
         fdatapath (str) : path and filename of desired TOA5 file
+        dtypes (dict)   : optional column dtypes, skips type inference for
+                          these columns (combined with any dtype kwarg,
+                          which takes precedence)
+        kwargs          : other keyword arguments passed to pandas.read_csv
     Return:
         parsed_df   : pandas DataFrame containing file data 
     """
@@ -251,6 +303,23 @@ def load_toa5(fdatapath, **kwargs) :
     if 'skiprows' in kwargs:
         skip = skip + kwargs.pop('skiprows')
 
+    # Use the C parser on a memory mapped file, read in one chunk (no mixed
+    # type inference across chunks), and cache parsed timestamps. The file
+    # options only apply to the C parser (the python engine rejects
+    # low_memory), so they are skipped if another engine is passed
+    if kwargs.setdefault('engine', 'c') == 'c':
+        kwargs.setdefault('memory_map', True)
+        kwargs.setdefault('low_memory', False)
+    kwargs.setdefault('cache_dates', True)
+    # Combine dtypes with a dtype passed through to read_csv
+    if dtypes is not None:
+        dtype = kwargs.pop('dtype', None)
+        if dtype is None:
+            dtype = dtypes
+        elif isinstance(dtype, dict):
+            dtype = {**dtypes, **dtype}
+        kwargs['dtype'] = dtype
+
     # Parse using Campbell timestamp
     parsed_df = pd.read_csv(fdatapath, skiprows=skip, header=0,
             parse_dates = { 'Date': [0]}, index_col='Date',
@@ -259,7 +328,8 @@ def load_toa5(fdatapath, **kwargs) :
     return parsed_df
 
 
-def concat_raw_files(files, iofunc=load_toa5, optmatch=None, reindex=None):
+def concat_raw_files(files, iofunc=load_toa5, optmatch=None, reindex=None,
+        max_workers=None):
     """
     Load a list of raw datalogger files, append them, and then return a pandas
     DataFrame object. 
@@ -273,6 +343,8 @@ def concat_raw_files(files, iofunc=load_toa5, optmatch=None, reindex=None):
         iofunc  : function used to load each file
         optmatch: optional string for matching filenames
         reindex: optional string with pandas frequency (default is None)
+        max_workers: number of threads used to load files (default is the
+                     number of CPUs, 1 loads files serially)
     Returns:
         ldf  : pandas DataFrame containing concatenated raw data
                       from one logger
@@ -280,15 +352,25 @@ def concat_raw_files(files, iofunc=load_toa5, optmatch=None, reindex=None):
             
     # Get list of datalogger filenames and file datestamps from directory
     # files, files_dt = get_file_list(datapath, optmatch=optmatch)
-    # Initialize DataFrame
-    ldf = pd.DataFrame()
-    # Loop through each year and fill the dataframe
-    for i in files:
-        # Call load_toa5_file
-        filedf = iofunc(i)
-        # And append to ldf, 'verify_integrity' warns if there are
-        # duplicate indices
-        ldf = ldf.append(filedf, verify_integrity=True)
+    # Load each file into a list of DataFrames. Files are parsed in parallel
+    # threads (the pandas csv parser releases the GIL), map keeps file order
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers > 1 and len(files) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            frames = list(ex.map(iofunc, files))
+    else:
+        frames = [iofunc(i) for i in files]
+    # Concatenate them once, 'verify_integrity' warns if there are
+    # duplicate indices
+    if frames:
+        ldf = pd.concat(frames, verify_integrity=True)
+    else:
+        ldf = pd.DataFrame()
+    # Convert repetitive string columns to categoricals once, for all files
+    # together (categoricals from different files would concatenate to
+    # object columns)
+    ldf = categorize_str_cols(ldf)
     # Either reindex (if requested) or order by index
     if reindex is not None:
         ldf = reindex_to(ldf, reindex)
@@ -318,6 +400,29 @@ def reindex_to(df, freq_in='10T'):
     return ridf
 
 
+@functools.lru_cache(maxsize=32)
+def _compile_renames(findvars, repvars):
+    """
+    Compile a sequence of variable renames (findvars[i] -> repvars[i]) into
+    a function that applies them in order to a string with re.sub. If all
+    names are literal, strings containing none of them (most data lines)
+    are found with one regex alternation and returned unchanged, since no
+    rename in the sequence could apply to them.
+    """
+    cres = [(re.compile(f), r) for f, r in zip(findvars, repvars)]
+    def rename(text):
+        for cre, repvar in cres:
+            text = cre.sub(repvar, text)
+        return text
+    if any(re.escape(f) != f for f in findvars):
+        return rename
+    anyvar = re.compile('|'.join(findvars))
+    def rename_matching(text):
+        if anyvar.search(text) is None:
+            return text
+        return rename(text)
+    return rename_matching
+
 def rename_raw_variables(lname, rawpath, rnpath, confdir=None):
     """
     Rename raw datalogger variables according to YAML configuration file
@@ -351,17 +456,17 @@ def rename_raw_variables(lname, rawpath, rnpath, confdir=None):
                     findvars = findvars + rn["from"]
                     repvars = repvars + rn["to"]
 
-            # Now read in file, replace target strings, write a new file
+            # Now stream the file line by line, replace target strings, and
+            # write a new file (or just copy it if there is nothing to rename)
             filepath = os.path.join(rawpath, filename)
-            with open(filepath, 'r') as file:
-                filedata = file.read()
-            for k, findvar in enumerate(findvars):
-                repvar = repvars[k]
-                #filedata = filedata.replace(findvar, repvar)
-                filedata = re.sub(findvar, repvar, filedata)
             rn_filepath = os.path.join(rnpath, filename)
-            with open(rn_filepath, 'w') as file:
-                file.write(filedata)
+            if not findvars:
+                shutil.copy(filepath, rn_filepath)
+                continue
+            rename = _compile_renames(tuple(findvars), tuple(repvars))
+            with open(filepath, 'r') as fin, open(rn_filepath, 'w') as fout:
+                for line in fin:
+                    fout.write(rename(line))
     else:
         print('No rename configuration for {0}, copying raw files'.format(
             lname))
@@ -369,6 +474,15 @@ def rename_raw_variables(lname, rawpath, rnpath, confdir=None):
             shutil.copy(os.path.join(rawpath, filename), rnpath)
 
 
+@functools.lru_cache(maxsize=None)
+def _git_head_sha(cwd):
+    """
+    Return the git HEAD SHA for the repository containing cwd. Cached, so
+    git is only called once per working directory.
+    """
+    return sp.check_output(['git', 'rev-parse', 'HEAD'],
+            cwd=cwd).decode('ascii').strip()
+
 def sawyer_out(df, lname, outpath, datestamp=None,
         prefix=None, suffix='00', ext='.txt'):
     """
@@ -389,19 +503,17 @@ def sawyer_out(df, lname, outpath, datestamp=None,
         scriptname = main.__file__
     except AttributeError:
         scriptname = 'interactive'
-    git_sha = sp.check_output(
-            ['git', 'rev-parse', 'HEAD']).decode('ascii').strip()
-    # Write metadata block
-    meta_data = pd.Series([('location: {0}'.format(lname)),
-        ('date generated: {0}'.format(str(dt.datetime.now()))),
-        ('writer: sawyer.io.sawyer_out'),
-        ('writer HEAD SHA: {0}'.format(git_sha)),
-        ('called from: {0}'.format(scriptname)),
-        ('-------------------')])
+    git_sha = _git_head_sha(os.getcwd())
+    # Write metadata block, then the data, to one open file
+    meta_data = ['---file metadata---',
+        'location: {0}'.format(lname),
+        'date generated: {0}'.format(str(dt.datetime.now())),
+        'writer: sawyer.io.sawyer_out',
+        'writer HEAD SHA: {0}'.format(git_sha),
+        'called from: {0}'.format(scriptname),
+        '-------------------']
     with open(outfile, 'w') as fout:
-        fout.write('---file metadata---\n')
-    #fout.close()
-        meta_data.to_csv(fout, mode='a', index=False, header=False)
+        fout.write('\n'.join(meta_data) + '\n')
         df.to_csv(fout, mode='a', na_rep='NA')
 
 def sawyer_in(filename, lname=None):
@@ -415,13 +527,13 @@ def sawyer_in(filename, lname=None):
 
     print('Opening ' + filename)
     with open(filename) as myfile:
-        #[print(next(myfile).replace('\n', "")) for x in range(7)]
-        fheader = [retpr(next(myfile)) for x in range(7)]
+        # Read the 7 line header, then parse the data from the same handle
+        fheader = [retpr(line) for line in itertools.islice(myfile, 7)]
     
-    if (lname is not None) and (
-            'location: {0}'.format(lname) not in fheader[1]):
-        raise ValueError('File contains data from incorrect logger')
+        if (lname is not None) and (
+                'location: {0}'.format(lname) not in fheader[1]):
+            raise ValueError('File contains data from incorrect logger')
     
-    df = pd.read_csv(filename, skiprows=7, parse_dates=True, index_col=0)
+        df = pd.read_csv(myfile, parse_dates=True, index_col=0)
 
-    return df
+    return categorize_str_cols(df)
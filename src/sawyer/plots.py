@@ -2,7 +2,22 @@
 Plot functions for checking data from a datalogger before or after qa processes
 """
 
+import os
+import sys
+import functools
+import pickle
+import concurrent.futures
 import pandas as pd
+import matplotlib
+# Use the non-interactive Agg backend for headless (save-only) plotting. This
+# can be requested with the SAWYER_HEADLESS environment variable, and is used
+# on linux systems without a display unless a backend was already chosen.
+if os.environ.get('SAWYER_HEADLESS') or (sys.platform.startswith('linux')
+        and not os.environ.get('DISPLAY')
+        and not os.environ.get('WAYLAND_DISPLAY')
+        and not os.environ.get('MPLBACKEND')
+        and 'matplotlib.pyplot' not in sys.modules):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import sawyer.dtools as dtool
@@ -17,36 +32,76 @@ class tcol:
     ENDC = '\033[0m'
     UNDERLINE = '\033[4m'
 
-if sy.conf.import_uplots:
-    import userplots as u
-    print(tcol.WARNING + "Importing user plots as submodule `u`: call " +
-            tcol.ENDC + tcol.UNDERLINE + "plots.u.<functionname>" + tcol.ENDC +
-            tcol.WARNING  + " .\n" + tcol.ENDC)
+def __getattr__(name):
+    """
+    Import the project's userplots.py (if the sawyer configuration found
+    one) as submodule `u` the first time plots.u is accessed
+    """
+    if name == 'u' and sy.conf.import_uplots:
+        import userplots as u
+        print(tcol.WARNING + "Importing user plots as submodule `u`: call " +
+                tcol.ENDC + tcol.UNDERLINE + "plots.u.<functionname>" +
+                tcol.ENDC + tcol.WARNING  + " .\n" + tcol.ENDC)
+        globals()['u'] = u
+        return u
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+@functools.lru_cache(maxsize=128)
+def _cached_vhv(cols, var, strexclude):
+    """
+    Memoized dtool.var_h_v_dict for a tuple of column names, so several
+    figures drawn from one dataframe parse the column names once. The
+    returned dict is shared between calls and should not be modified.
+    """
+    return dtool.var_h_v_dict(cols, var, str_exclude=strexclude)
 
-def meas_profile_tsfig(df, lname, var, ylabel, strexclude=None, ylimit=None):
+def _set_window_title(fig, title):
     """
-    Make a time series figure for sensors in a measurement profile
+    Set the window title of fig. This is skipped for non-interactive
+    backends (ie. Agg when saving figures in batch), which have no window.
+    """
+    if (matplotlib.get_backend().lower() not in
+            ('agg', 'pdf', 'svg', 'ps', 'cairo', 'pgf', 'template')
+            and fig.canvas.manager is not None):
+        fig.canvas.manager.set_window_title(title)
+
+def meas_profile_tsfig(df, lname, var, ylabel, strexclude=None, ylimit=None,
+        figs=None):
+    """
+    Make a time series figure for sensors in a measurement profile. The
+    figure returned by an earlier call for the same profiles can be passed
+    as figs, and the line for each depth is then updated with the new data
+    instead of making a new figure.
     """
     # Get measurement dictionary
-    measdict = dtool.var_h_v_dict(df.columns, var,
-            str_exclude=strexclude)
+    measdict = _cached_vhv(tuple(df.columns), var, strexclude)
     nplots = len(measdict.keys())
     # Set up plot
-    fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
-    if nplots==1: ax = [ax]
-    fig.canvas.manager.set_window_title(lname + ' ' + var + ' timeseries') 
-    # Loop through each profile and depth and plot
-    for i, pnum in enumerate(sorted(measdict.keys())):
-        for d in measdict[pnum]:
-            colname = pnum + '_' + d
-            ax[i].plot( df.index, df[colname], marker='.', lw=1.25, label=str(d)+'cm' )
+    fig, ax = _subplots(nplots, figs)
+    _set_window_title(fig, lname + ' ' + var + ' timeseries')
+    # Loop through each profile and depth and plot (or update the existing
+    # line for the depth), then rescale updated axes once
+    idx = df.index.values
+    for i, (pnum, depths) in enumerate(sorted(measdict.items())):
+        colnames = [f"{pnum}_{d}" for d in depths]
+        sub = df[colnames].to_numpy()
+        labels = [f"{d}cm" for d in depths]
+        updated = False
+        for j in range(len(depths)):
+            updated |= _plot_line(ax[i], idx, sub[:, j], marker='.', lw=1.25,
+                    label=labels[j], reuse=figs is not None)
+        if updated:
+            ax[i].relim()
+            ax[i].autoscale_view()
         ax[i].legend(loc='upper left', bbox_to_anchor=(0, 1.05),
                 ncol=4, fontsize=10)
         if ylimit is not None:
             ax[i].set_ylim(ylimit)
         ax[i].set_title('Profile ' + pnum)
         ax[i].set_ylabel(ylabel)
+    if figs is not None:
+        fig.canvas.draw_idle()
     return fig
 
 def meas_profile_scatterfig(df, lname, var, ylabel, strexclude=None,
@@ -55,20 +110,32 @@ def meas_profile_scatterfig(df, lname, var, ylabel, strexclude=None,
     Make a scatterplot figure for sensors in a measurement profile
     """
     # Get measurement dictionary
-    measdict = dtool.var_h_v_dict(df.columns, var,
-            str_exclude=strexclude)
+    measdict = _cached_vhv(tuple(df.columns), var, strexclude)
     nplots = len(measdict.keys())
     # Set up plot
     fig, ax = plt.subplots(1, nplots, figsize=(7, 5), sharey=True)
     if nplots==1: ax = [ax]
-    fig.canvas.manager.set_window_title(lname + ' ' + var + ' profile') 
-    # Loop through each profile and depth and plot againt depth
-    for i, pnum in enumerate(sorted(measdict.keys())):
-        for d in measdict[pnum]:
-            depth = d.split('_')[0]
-            colname = pnum + '_' + d
-            ax[i].plot(df[colname],np.tile(-int(depth), [len(df), 1]),
-                    marker='o', ls='None', label=str(depth)+'cm' )
+    _set_window_title(fig, lname + ' ' + var + ' profile')
+    # Depths are colored through the default color cycle
+    colors = matplotlib.colors.to_rgba_array(
+            plt.rcParams['axes.prop_cycle'].by_key()['color'])
+    # Loop through each profile and plot all depths against depth as a
+    # single scatter artist, colored by depth index through a colormap
+    for i, (pnum, depths) in enumerate(sorted(measdict.items())):
+        colnames = [f"{pnum}_{d}" for d in depths]
+        sub = df[colnames].to_numpy()
+        depth_ints = np.array([int(d.split('_')[0]) for d in depths],
+                dtype=np.int32)
+        c = colors[np.arange(len(depths)) % len(colors)]
+        ax[i].scatter(sub.ravel(order='F'), np.repeat(-depth_ints, len(sub)),
+                c=np.repeat(np.arange(len(depths)), len(sub)),
+                cmap=matplotlib.colors.ListedColormap(c),
+                vmin=-0.5, vmax=len(depths)-0.5, rasterized=True)
+        # Empty labelled lines, so ax.legend() lists the depths
+        labels = [f"{d}cm" for d in depth_ints]
+        for j in range(len(depths)):
+            ax[i].plot([], [], marker='o', ls='None', color=c[j],
+                    label=labels[j])
         ax[i].set_title('Profile ' + pnum)
         ax[i].set_ylim(ylimit)
         ax[i].set_xlabel(ylabel)
@@ -85,125 +152,409 @@ def tsfig_add_filedates(fig, filedates):
         ymin, ymax = a.get_ylim()
         a.vlines(filedates, ymin, ymax, linestyles='dotted',lw=0.5)
 
-def qa_var_tsplot(ax, varname, df, df_qa, df_qa_masked):
+@functools.lru_cache(maxsize=None)
+def _numba_kernels():
     """
-    Plot a variable showing what has been modified in the qa process
+    Compile versions of the _mask_diff and _decimate kernels with numba, if
+    it is installed (imported on first use, not with this module). Returns
+    a (mask_diff, minmax) tuple, or None without numba. fastmath is not
+    used because both kernels depend on NaN checks.
     """
-    #varname_f = varname + '_flag'
-    # Plot original data and overlay qa data
-    ax.plot(df.index, df[varname], marker= '.', ls='none', color = '0.75',
-            label='Raw file data')
-    ax.plot(df_qa.index, df_qa[varname], '.k', label='QA file data')
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(parallel=True, cache=True)
+    def mask_diff(a, b):
+        out = np.empty(a.shape[0], dtype=np.bool_)
+        for k in numba.prange(a.shape[0]):
+            out[k] = a[k] != b[k] and not (np.isnan(a[k]) and np.isnan(b[k]))
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def minmax(y, starts):
+        nbins = starts.shape[0]
+        ymin = np.empty(nbins, dtype=y.dtype)
+        ymax = np.empty(nbins, dtype=y.dtype)
+        for b in numba.prange(nbins):
+            en = starts[b+1] if b+1 < nbins else y.shape[0]
+            lo = np.nan
+            hi = np.nan
+            for k in range(starts[b], en):
+                v = y[k]
+                if not np.isnan(v):
+                    if np.isnan(lo) or v < lo:
+                        lo = v
+                    if np.isnan(hi) or v > hi:
+                        hi = v
+            ymin[b] = lo
+            ymax[b] = hi
+        return ymin, ymax
+
+    return mask_diff, minmax
+
+def _use_numba(*arrays):
+    """
+    Check if the numba kernels can be used for the given arrays
+    """
+    return (all(a.dtype in (np.float32, np.float64) for a in arrays)
+            and _numba_kernels() is not None)
+
+def _mask_diff(a, b):
+    """
+    Return a boolean array that is True where arrays a and b (of the same
+    shape) differ, treating NaN values in the same position as equal
+    """
+    if _use_numba(a, b):
+        mask_diff, _ = _numba_kernels()
+        return mask_diff(a.ravel(), b.ravel()).reshape(a.shape)
+    return (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+def _decimate(x, y, max_points):
+    """
+    Min/max decimation of a series for plotting. The data are split into
+    max_points/2 evenly spaced bins and the minimum and maximum of each bin
+    are returned (interleaved, placed at the first and last x of the bin).
+    NaN values are ignored unless a whole bin is NaN. Arrays no longer than
+    max_points (or max_points=None) are returned unchanged.
+    """
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return x, y
+    nbins = max(max_points // 2, 1)
+    starts = np.linspace(0, n, nbins, endpoint=False).astype(np.intp)
+    ends = np.append(starts[1:], n) - 1
+    x_out = np.empty(2*nbins, dtype=x.dtype)
+    y_out = np.empty(2*nbins, dtype=np.result_type(y.dtype, np.float32))
+    x_out[0::2] = x[starts]
+    x_out[1::2] = x[ends]
+    if y.ndim == 1 and _use_numba(y):
+        _, minmax = _numba_kernels()
+        y_out[0::2], y_out[1::2] = minmax(y, starts)
+    else:
+        y_out[0::2] = np.fmin.reduceat(y, starts)
+        y_out[1::2] = np.fmax.reduceat(y, starts)
+    return x_out, y_out
+
+def _as_float32(a):
+    """
+    Downcast float64 values to float32 for plotting (halves the data passed
+    through matplotlib, with no visible loss of precision)
+    """
+    if a.dtype == np.float64:
+        return a.astype(np.float32)
+    return a
+
+def _ax_lines(ax):
+    """
+    Return the dict of lines (and datashader images) drawn on ax by
+    _plot_line or _ds_points, by label. It is stored on ax, so it is
+    pickled with the figure and freed with it.
+    """
+    if not hasattr(ax, '_sawyer_lines'):
+        ax._sawyer_lines = {}
+    return ax._sawyer_lines
+
+def _plot_line(ax, x, y, *args, reuse=False, **kwargs):
+    """
+    Plot x and y on ax. If reuse is True and a line with the same label was
+    plotted on ax before, update that line's data instead. Returns True if
+    a line was updated.
+    """
+    lines = _ax_lines(ax)
+    line = lines.get(kwargs['label'])
+    if reuse and line is not None and line.axes is ax:
+        line.set_data(x, y)
+        return True
+    lines[kwargs['label']], = ax.plot(x, y, *args, **kwargs)
+    return False
+
+def _no_data(ax, reuse, *arrays):
+    """
+    Check if there is nothing to plot on ax because none of the arrays have
+    finite values (ie. decommissioned sensors), and (if reuse is True) ax
+    has no lines from an earlier call that would need updating
+    """
+    return (not (reuse and getattr(ax, '_sawyer_lines', None))
+            and not any(np.isfinite(a).any() for a in arrays))
+
+def _subplots(nplots, fig=None):
+    """
+    Return a new figure with nplots vertically stacked subplots, or the
+    figure and axes of fig if an existing figure is given
+    """
+    if fig is not None:
+        return fig, fig.axes
+    fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
+    if nplots==1: ax = [ax]
+    return fig, ax
+
+def _ds_points(ax, idx, ys, colors, labels, reuse=False):
+    """
+    Draw series of points sharing the datetime index idx on ax as datashader
+    images (one single-color image per series). If reuse is True, images
+    with the same labels from an earlier call are replaced. Returns True if
+    images were replaced.
+    """
+    import datashader as ds
+    from datashader.mpl_ext import dsshow
+    x = matplotlib.dates.date2num(idx)
+    finite = [np.isfinite(y) for y in ys]
+    yvals = np.concatenate([y[f] for y, f in zip(ys, finite)])
+    lines = _ax_lines(ax)
+    updated = False
+    for y, f, color, label in zip(ys, finite, colors, labels):
+        old = lines.pop(label, None)
+        if reuse and old is not None:
+            old.remove()
+            updated = True
+        # dsshow sets the axis limits, so give all images the same ranges
+        if f.any():
+            lines[label] = dsshow(pd.DataFrame({'x': x[f], 'y': y[f]}),
+                    ds.Point('x', 'y'), ds.any(), ax=ax,
+                    cmap=matplotlib.colors.ListedColormap([color]),
+                    x_range=(x.min(), x.max()),
+                    y_range=(yvals.min(), yvals.max()), aspect='auto')
+    ax.xaxis_date()
+    return updated
+
+def _qa_tsplot_arrays(ax, idx, raw, qa, test_qa, test_mask, max_points=None,
+        backend='matplotlib', reuse=False):
+    """
+    Draw the qa_var_tsplot lines from arrays of the index, raw and qa values,
+    and boolean arrays marking values that were shifted or masked in qa. If
+    reuse is True, lines drawn on ax by an earlier call are updated instead.
+    """
+    if _no_data(ax, reuse, raw, qa):
+        return ax
+    raw = _as_float32(raw)
+    qa = _as_float32(qa)
+    # Plot original data and overlay qa data. Dense marker artists are
+    # rasterized so vector output (pdf/svg) stays small and fast to save.
+    # With the datashader backend they are drawn as aggregated images
+    if backend == 'datashader':
+        updated = _ds_points(ax, idx, [raw, qa], ['0.75', 'k'],
+                ['Raw file data', 'QA file data'], reuse)
+    else:
+        updated = _plot_line(ax, *_decimate(idx, raw, max_points),
+                marker= '.', ls='none', color = '0.75', label='Raw file data',
+                rasterized=True, reuse=reuse)
+        _plot_line(ax, *_decimate(idx, qa, max_points), '.k',
+                label='QA file data', rasterized=True, reuse=reuse)
     # If there is a shift between them circle it
-    test_qa = df[varname] != df_qa[varname]
-    ax.plot(df_qa.index[test_qa], df_qa[varname][test_qa], 'o', mfc='none',
-            mec='xkcd:neon green', mew='0.3', alpha=.5, label='Shifted in QA')
+    _plot_line(ax, idx[test_qa], qa[test_qa], 'o', mfc='none',
+            mec='xkcd:neon green', mew='0.3', alpha=.5, label='Shifted in QA',
+            rasterized=True, reuse=reuse)
     # Plot the removed data in red
-    test_mask = df_qa_masked[varname] != df_qa[varname]
-    ax.plot(df_qa.index[test_mask], df_qa[varname][test_mask], '.r',
-            label='Masked values')
+    _plot_line(ax, idx[test_mask], qa[test_mask], '.r',
+            label='Masked values', rasterized=True, reuse=reuse)
+    if updated:
+        ax.relim()
+        ax.autoscale_view()
+    return ax
+
+def qa_var_tsplot(ax, varname, df, df_qa, df_qa_masked, max_points=None):
+    """
+    Plot a variable showing what has been modified in the qa process. If
+    max_points is given, the raw and qa series are min/max decimated to
+    about that many points before plotting.
+    """
+    #varname_f = varname + '_flag'
+    # Work with the underlying arrays (df, df_qa and df_qa_masked share the
+    # same index, and no copies are made)
+    idx = df_qa.index.values
+    raw = df[varname].to_numpy(copy=False)
+    qa = df_qa[varname].to_numpy(copy=False)
+    qa_masked = df_qa_masked[varname].to_numpy(copy=False)
+    _qa_tsplot_arrays(ax, idx, raw, qa, _mask_diff(raw, qa),
+            _mask_diff(qa_masked, qa), max_points)
     ax.set_ylabel(varname)
     #ax.legend()
 
     return ax
 
-def gf_var_tsplot(ax, varname, df_qa, df_gf):
+def gf_var_tsplot(ax, varname, df_qa, df_gf, max_points=None):
+    """
+    Plot a variable showing what has been gapfilled. If max_points is given,
+    both series are min/max decimated to about that many points before
+    plotting.
+    """
+    return _gf_tsplot(ax, varname, df_qa, df_gf, max_points)
+
+def _gf_tsplot(ax, varname, df_qa, df_gf, max_points=None, reuse=False):
     """
-    Plot a variable showing what has been gapfilled
+    Draw the gf_var_tsplot lines. If reuse is True, lines drawn on ax by an
+    earlier call are updated with the new data instead.
     """
     #varname_f = varname + '_f'
-    # Plot gapfill data oand overlay qa data
-    ax.plot(df_gf.index, df_gf[varname], marker= '.', ls='none',
-            color = 'xkcd:neon green', label='Gapfilled')
-    ax.plot(df_qa.index, df_qa[varname], marker='.', ls='none',
-            color='k', label='Original')    
+    # Work with the underlying arrays (no copies are made)
+    idx_gf = df_gf.index.values
+    idx_qa = df_qa.index.values
+    gf = df_gf[varname].to_numpy(copy=False)
+    qa = df_qa[varname].to_numpy(copy=False)
+    if _no_data(ax, reuse, gf, qa):
+        ax.set_ylabel(varname)
+        return ax
+    gf = _as_float32(gf)
+    qa = _as_float32(qa)
+    # Plot gapfill data oand overlay qa data (rasterized like qa_var_tsplot)
+    updated = _plot_line(ax, *_decimate(idx_gf, gf, max_points), marker= '.',
+            ls='none', color = 'xkcd:neon green', label='Gapfilled',
+            rasterized=True, reuse=reuse)
+    _plot_line(ax, *_decimate(idx_qa, qa, max_points), marker='.', ls='none',
+            color='k', label='Original', rasterized=True, reuse=reuse)
+    if updated:
+        ax.relim()
+        ax.autoscale_view()
     ax.set_ylabel(varname)
     ax.legend()
 
     return ax
 
+def _qa_profile_fig(fig, varnames, df, df_qa, df_qamask, ylabel, max_points,
+        backend='matplotlib'):
+    """
+    Plot the qa results for varnames in subplots of fig (a new figure if
+    fig is None, otherwise the lines of fig are updated)
+    """
+    reuse = fig is not None
+    fig, ax = _subplots(len(varnames), fig)
+    # Compare the whole block of variables at once and plot column slices
+    idx = df_qa.index.values
+    raw = df[varnames].to_numpy()
+    qa = df_qa[varnames].to_numpy()
+    test_qa = _mask_diff(raw, qa)
+    test_mask = _mask_diff(df_qamask[varnames].to_numpy(), qa)
+    for v, varname in enumerate(varnames):
+        _qa_tsplot_arrays(ax[v], idx, raw[:, v], qa[:, v], test_qa[:, v],
+                test_mask[:, v], max_points, backend, reuse)
+        ax[v].set_title(varname)
+        ax[v].set_ylabel(ylabel)
+    return fig
+
+def _qa_profile_fig_pickled(*args):
+    """
+    Worker process version of _qa_profile_fig that draws with the Agg backend
+    and returns the pickled figure
+    """
+    plt.switch_backend('Agg')
+    fig = _qa_profile_fig(None, *args)
+    figbytes = pickle.dumps(fig)
+    plt.close(fig)
+    return figbytes
+
 def qa_var_tsfig(df, df_qa, df_qamask, lname, var, ylabel, 
-        get_vardict=False, strexclude=None, ylimit=None):
+        get_vardict=False, strexclude=None, ylimit=None, max_points=None,
+        figs=None, max_workers=1, backend='matplotlib'):
     """
     Make a figure that plots the results of the qa process. Either a list of
     variables to plot can be supplied, or a vardict can be requested, which 
-    will plot one or more profiles of variables.
+    will plot one or more profiles of variables. max_points is passed on to
+    qa_var_tsplot to decimate long series. The figure(s) returned by an
+    earlier call for the same variables (and backend) can be passed as figs,
+    and their existing lines are then updated with the new data (ie. after
+    changing qa or gapfilling settings) instead of making new figures. If
+    max_workers > 1 and a vardict is requested, the profile figures are
+    made in parallel by a pool of that many processes. With
+    backend='datashader' (requires the datashader package) the raw and qa
+    data are drawn as datashader images that are re-aggregated when zooming,
+    which is much faster for dense data; figures are then always made
+    serially.
     """
+    if backend not in ('matplotlib', 'datashader'):
+        raise ValueError("backend must be 'matplotlib' or 'datashader'")
     nfigs = 1
     # If requested convert var to a var_h_v dict (for measurement profiles)
     if get_vardict:
-        figs = []
+        oldfigs, figs = figs, []
         # Get the variable h_v dict to set up the number of figs
-        vardict = dtool.var_h_v_dict(df_qa.columns, var,
-            str_exclude=strexclude)
+        vardict = _cached_vhv(tuple(df_qa.columns), var, strexclude)
         nfigs = len(vardict.keys())
+        profiles = sorted(vardict.items())
+        varnames = [[f"{prof}_{vert}" for vert in vertlist]
+                for prof, vertlist in profiles]
         # For each "h" location (profile) make a figure with subplots for
-        # each "v" location
-        for p, prof in enumerate(sorted(vardict.keys())):
-            nplots = len(vardict[prof])
-            fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
-            if nplots==1: ax = [ax]
-            fig.canvas.manager.set_window_title(lname + ' ' + prof + ' QA timeseries')
-            for v, vert in enumerate(vardict[prof]):
-                varname = prof + '_' + vert
-                qa_var_tsplot(ax[v], varname, df, df_qa, df_qamask)
-                ax[v].set_title(varname)
-                ax[v].set_ylabel(ylabel)
+        # each "v" location. New figures can be made in worker processes,
+        # each getting only the columns for its profile
+        parallel = (oldfigs is None and max_workers > 1
+                and backend == 'matplotlib')
+        if parallel:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers) as executor:
+                futures = [executor.submit(_qa_profile_fig_pickled, vn,
+                    df[vn], df_qa[vn], df_qamask[vn], ylabel, max_points)
+                    for vn in varnames]
+                newfigs = [pickle.loads(f.result()) for f in futures]
+        for p, (prof, vertlist) in enumerate(profiles):
+            if parallel:
+                fig = newfigs[p]
+            else:
+                fig = _qa_profile_fig(None if oldfigs is None else oldfigs[p],
+                        varnames[p], df, df_qa, df_qamask, ylabel, max_points,
+                        backend)
+            _set_window_title(fig, lname + ' ' + prof + ' QA timeseries')
+            if oldfigs is not None:
+                fig.canvas.draw_idle()
             figs.append(fig)
         return figs
     # Otherwise just plot each supplied variable in a subplot
     else:
-        nplots = len(var)
-        # Set up plot
-        fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
-        if nplots==1: ax = [ax]
-        fig.canvas.manager.set_window_title(lname + ' QA timeseries') 
-        # Loop through each profile and depth and plot
-        for i, vname in enumerate(var):
-            qa_var_tsplot(ax[i], vname, df, df_qa, df_qamask)
-            ax[i].set_title(vname)
-            ax[i].set_ylabel(ylabel)
+        fig = _qa_profile_fig(figs, list(var), df, df_qa, df_qamask, ylabel,
+                max_points, backend)
+        _set_window_title(fig, lname + ' QA timeseries')
+        if figs is not None:
+            fig.canvas.draw_idle()
         return fig
 
 def gf_var_tsfig(df_qa, df_gf, lname, var, ylabel, 
-        get_vardict=False, strexclude=None, ylimit=None):
+        get_vardict=False, strexclude=None, ylimit=None, max_points=None,
+        figs=None):
     """
     Make a figure that plots the results of the gapfilling. Either a list of
     variables to plot can be supplied, or a vardict can be requested, which 
-    will plot one or more profiles of variables.
+    will plot one or more profiles of variables. max_points is passed on to
+    gf_var_tsplot to decimate long series. The figure(s) returned by an
+    earlier call for the same variables can be passed as figs, and their
+    existing lines are then updated with the new data (ie. after changing
+    qa or gapfilling settings) instead of making new figures.
     """
     nfigs = 1
     # If requested convert var to a var_h_v dict (for measurement profiles)
     if get_vardict:
-        figs = []
+        oldfigs, figs = figs, []
         # Get the variable h_v dict to set up the number of figs
-        vardict = dtool.var_h_v_dict(df_qa.columns, var,
-            str_exclude=strexclude)
+        vardict = _cached_vhv(tuple(df_qa.columns), var, strexclude)
         nfigs = len(vardict.keys())
         # For each "h" location (profile) make a figure with subplots for
         # each "v" location
-        for p, prof in enumerate(sorted(vardict.keys())):
-            nplots = len(vardict[prof])
-            fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
-            if nplots==1: ax = [ax]
-            fig.canvas.manager.set_window_title(lname + ' ' + prof + ' GF timeseries')
-            for v, vert in enumerate(vardict[prof]):
-                varname = prof + '_' + vert
-                gf_var_tsplot(ax[v], varname, df_qa, df_gf)
+        for p, (prof, vertlist) in enumerate(sorted(vardict.items())):
+            nplots = len(vertlist)
+            fig, ax = _subplots(nplots,
+                    None if oldfigs is None else oldfigs[p])
+            _set_window_title(fig, lname + ' ' + prof + ' GF timeseries')
+            varnames = [f"{prof}_{vert}" for vert in vertlist]
+            for v, varname in enumerate(varnames):
+                _gf_tsplot(ax[v], varname, df_qa, df_gf, max_points,
+                        reuse=oldfigs is not None)
                 ax[v].set_title(varname)
                 ax[v].set_ylabel(ylabel)
+            if oldfigs is not None:
+                fig.canvas.draw_idle()
             figs.append(fig)
         return figs
     # Otherwise just plot each supplied variable in a subplot
     else:
         nplots = len(var)
         # Set up plot
-        fig, ax = plt.subplots(nplots, figsize=(11.5, 8), sharex=True)
-        if nplots==1: ax = [ax]
-        fig.canvas.manager.set_window_title(lname + ' GF timeseries') 
+        fig, ax = _subplots(nplots, figs)
+        _set_window_title(fig, lname + ' GF timeseries')
         # Loop through each profile and depth and plot
         for i, vname in enumerate(var):
-            gf_var_tsplot(ax[i], vname, df_qa, df_gf)
+            _gf_tsplot(ax[i], vname, df_qa, df_gf, max_points,
+                    reuse=figs is not None)
             ax[i].set_title(vname)
             ax[i].set_ylabel(ylabel)
+        if figs is not None:
+            fig.canvas.draw_idle()
         return fig
@@ -86,14 +86,14 @@ def apply_qa_flags(df, flags):
             # Or find dataframe columns matching those in qa_flags
             colrange = tools.regex_colnames(df.columns, flag['columns'])
         # Get the index range to be flagged
-        idxrange = np.logical_and(df.index >= st, df.index <= en)
+        idxrange = (df.index >= st) & (df.index <= en)
         # Get the mask for flag k and set appropriate flag
         df_new, mask_k, rm = qafunc(df_new, idxrange, colrange,
                 *qa_args, **qa_kwargs)
         # Add mask_k to df_flag and to df_mask if data are to be masked
         df_flag = df_flag.where(mask_k, other=k)
         if rm:
-            df_mask = np.logical_or(df_mask, mask_k)
+            df_mask = df_mask | mask_k
 
     # Rewrite df_flag column names
     df_flag.columns = df_flag.columns + '_flag'
@@ -30,6 +30,55 @@ import pdb
 
 nancval = ['NAN', 'NaN', 'Nan', 'nan']
 
+def _equals(col, cval):
+    """Test column values for equality with cval. Categorical columns are
+    compared using their integer codes.
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        if cval not in col.cat.categories:
+            return np.zeros(len(col), dtype=bool)
+        code = col.cat.categories.get_loc(cval)
+        return col.cat.codes.to_numpy() == code
+    return col.to_numpy() == cval
+
+def _equals_block(block, cval):
+    """Test a block of dataframe columns for equality with cval, returning a
+    2-D boolean array. Categorical columns are handled column by column.
+    """
+    if any(isinstance(t, pd.CategoricalDtype) for t in block.dtypes):
+        out = np.zeros(block.shape, dtype=bool)
+        for j in range(block.shape[1]):
+            out[:, j] = _equals(block.iloc[:, j], cval)
+        return out
+    try:
+        return np.equal(block.to_numpy(), cval)
+    except TypeError:
+        # cval can't be compared with the block's values (ie. a string
+        # cval for numeric columns), so nothing is equal
+        return np.zeros(block.shape, dtype=bool)
+
+# Comparison functions used by mask_by_comparison and mask_by_comparison_ind.
+# Each takes a block of dataframe columns and cval and returns a 2-D boolean
+# array the shape of the block.
+_comparisons = {
+    'above': lambda block, cval: np.greater(block.to_numpy(), cval),
+    'below': lambda block, cval: np.less(block.to_numpy(), cval),
+    'equals': _equals_block,
+    'isnan': lambda block, cval: np.isnan(block.to_numpy())}
+
+def _get_comparison(comparison):
+    """Return the comparison function for a comparison name
+
+    Raises
+    ------
+    ValueError
+        if comparison is not one of the keys in _comparisons
+    """
+    try:
+        return _comparisons[comparison]
+    except KeyError:
+        raise ValueError('Invalid comparison (above, below, equals)')
+
 
 def scale_by_multiplier(df, idxrange, colrange, multiplier, **kwargs):
     """Scale values in given dataframe ranges by a multiplier
@@ -50,6 +99,7 @@ def scale_by_multiplier(df, idxrange, colrange, multiplier, **kwargs):
     [type]
         [description]
     """
+    idxrange = np.asarray(idxrange, dtype=bool)
     mask = pd.DataFrame(False, index=df.index, columns=df.columns)
     mask.loc[idxrange, colrange] = True
     df[mask] = df[mask] * multiplier
@@ -72,6 +122,7 @@ def mask_by_datetime(df, idxrange, colrange, **kwargs):
     [type]
         [description]
     """
+    idxrange = np.asarray(idxrange, dtype=bool)
     mask = pd.DataFrame(False, index=df.index, columns=df.columns)
     mask.loc[idxrange, colrange] = True
     return [df, mask, True]
@@ -109,20 +160,13 @@ def mask_by_comparison(df, idxrange, colrange, comparison, cval, **kwargs):
     if cval in nancval:
         comparison = 'isnan'
 
+    op = _get_comparison(comparison)
+    idxrange = np.asarray(idxrange, dtype=bool)
     mask = pd.DataFrame(False, index=df.index, columns=df.columns)
-    for c in colrange:
-        if comparison=='above':
-            idxrange_th = np.logical_and(idxrange, df[c] > cval)
-        elif comparison=='below':
-            idxrange_th = np.logical_and(idxrange, df[c] < cval)
-        elif comparison=='equals':
-            idxrange_th = np.logical_and(idxrange, df[c] == cval)
-        elif comparison=='isnan':
-            idxrange_th = np.logical_and(idxrange, np.isnan(df[c]))
-
-        else:
-            raise ValueError('Invalid comparison (above, below, equals)')
-        mask.loc[idxrange_th, c] = True
+    # Compare all columns in colrange at once, then constrain to idxrange
+    idxrange_th = op(df[colrange], cval)
+    idxrange_th &= idxrange[:, None]
+    mask.loc[:, colrange] = idxrange_th
     return [df, mask, True]
 
 def mask_by_comparison_ind(df, idxrange, colrange, indvar,
@@ -162,20 +206,46 @@ def mask_by_comparison_ind(df, idxrange, colrange, indvar,
     if cval in nancval:
         comparison = 'isnan'
 
+    op = _get_comparison(comparison)
+    idxrange = np.asarray(idxrange, dtype=bool)
     mask = pd.DataFrame(False, index=df.index, columns=df.columns)
-    if comparison=='above':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] > cval)
-    elif comparison=='below':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] < cval)
-    elif comparison=='equals':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] == cval)
-    elif comparison=='isnan':
-        idxrange_thv = np.logical_and(idxrange, np.isnan(df[indvar]))
-    else:
-        raise ValueError('Invalid comparison (above, below, equals)')
+    idxrange_thv = idxrange & op(df[[indvar]], cval)[:, 0]
     mask.loc[idxrange_thv, colrange] = True
     return [df, mask, True]
 
+def _rolling_stat(s, stat, window):
+    """Centered moving statistic ('mean', 'median' or 'std') of a series.
+
+    Fixed (integer) window medians use bottleneck's move_median if
+    bottleneck is installed. Otherwise, and for time-based windows (ie.
+    '30min'), pandas rolling windows are used.
+    """
+    if isinstance(window, int):
+        try:
+            import bottleneck as bn
+        except ImportError:
+            bn = None
+        # Only the median is used from bottleneck. Its move_mean and
+        # move_std keep running sums that differ from pandas in the last
+        # bits, which changes results of exact comparisons (ie. flat
+        # "stuck sensor" segments). bottleneck also raises for series
+        # shorter than the window, where pandas returns NaN
+        offset = (window - 1) // 2
+        if bn is not None and stat=='median' and len(s) + offset >= window:
+            # bottleneck windows are trailing - pad the end of the series
+            # and shift the result to center the window like pandas does.
+            # bottleneck needs min_count >= 1 (pandas allows 0 for window=1)
+            min_count = max(window - 1, 1)
+            vals = np.concatenate([s.to_numpy(dtype=np.float64),
+                np.full(offset, np.nan)])
+            res = bn.move_median(vals, window=window, min_count=min_count)
+            return pd.Series(res[offset:], index=s.index)
+        min_periods = window - 1
+    else:
+        min_periods = None
+    roll = s.rolling(window, center=True, min_periods=min_periods)
+    return getattr(roll, stat)()
+
 def mask_by_rolling_stat(df, idxrange, colrange, indvar, stat,
         window, comparison, thresh=0, **kwargs):
     """    Mask values in matching idxrange and colrange AND where an independent
@@ -212,29 +282,23 @@ def mask_by_rolling_stat(df, idxrange, colrange, indvar, stat,
     ValueError
         [description]
     """
+    idxrange = np.asarray(idxrange, dtype=bool)
     mask = pd.DataFrame(False, index=df.index, columns=df.columns)    
     
     # Calculate the time series statistic
-    if stat=='mean':
-        stat_ts = df[indvar].rolling(window,
-                center=True, min_periods=window-1).mean()
-    elif stat=='median':
-        stat_ts = df[indvar].rolling(window,
-                center=True, min_periods=window-1).median()
-    elif stat=='std':
-        #raise ValueError('This STDDEV filter is not working yet!!!')
-        stat_ts = df[indvar].rolling(window,
-                center=True, min_periods=window-1).std()
-    else:
+    if stat not in ('mean', 'median', 'std'):
         raise ValueError('Invalid statistic (mean, median, stdv)')
+    stat_ts = _rolling_stat(df[indvar], stat, window)
     
     # Compare the data to stat_ts and flag
+    vals = df[indvar].to_numpy()
+    stat_ts = stat_ts.to_numpy()
     if comparison=='above':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] > stat_ts + thresh)
+        idxrange_thv = idxrange & (vals > stat_ts + thresh)
     elif comparison=='below':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] < stat_ts - thresh)
+        idxrange_thv = idxrange & (vals < stat_ts - thresh)
     elif comparison=='equals':
-        idxrange_thv = np.logical_and(idxrange, df[indvar] == stat_ts)
+        idxrange_thv = idxrange & (vals == stat_ts)
     else:
         raise ValueError('Invalid comparison (above, below, equals)')
     mask.loc[idxrange_thv, colrange] = True
@@ -0,0 +1,39 @@
+"""
+Tests for YAML configuration parsing in sawyer.config
+"""
+
+import pytest
+
+from sawyer import config
+
+# Plain scalars that YAML 1.1 (PyYAML's default) and YAML 1.2 (ruamel.yaml)
+# resolve differently, with the YAML 1.2 result
+YAML12_SCALARS = [
+    ('NO', 'NO'), ('no', 'no'), ('ON', 'ON'), ('off', 'off'),
+    ('Yes', 'Yes'), ('y', 'y'), ('true', True), ('FALSE', False),
+    ('10:30', '10:30'), ('1:20:30.5', '1:20:30.5'), ('010', 10),
+    ('0o10', 8), ('0x1F', 31), ('-0b101', -5), ('1_000', 1000),
+    ('1e3', 1000.0), ('-1E3', -1000.0), ('.5', 0.5), ('.inf', float('inf')),
+    ]
+
+@pytest.mark.parametrize('scalar, expected', YAML12_SCALARS)
+def test_load_yaml_uses_yaml12_scalars(scalar, expected):
+    assert config.load_yaml('v: ' + scalar) == {'v': expected}
+
+def test_load_yaml_keeps_yaml11_bool_keys(tmp_path):
+    # ie. a nitric oxide (NO) logger in loggers.yaml, and column names in
+    # var_rename.yaml
+    conf = tmp_path / 'loggers.yaml'
+    conf.write_text('NO:\n  rawfreq: 10min\nON:\n  rawfreq: 30min\n'
+            'items:\n  1:\n    from: [NO, off]\n    to: [NO_1_1, OFF_1_1]\n')
+    loaded = config.load_yaml_file(str(conf))
+    assert list(loaded) == ['NO', 'ON', 'items']
+    assert loaded['items'][1] == {'from': ['NO', 'off'],
+            'to': ['NO_1_1', 'OFF_1_1']}
+    assert ', '.join(k for k in loaded if k != 'items') == 'NO, ON'
+
+def test_load_yaml_matches_ruamel():
+    ruamel_yaml = pytest.importorskip('ruamel.yaml')
+    doc = '\n'.join('k{0}: {1}'.format(i, s)
+            for i, (s, _) in enumerate(YAML12_SCALARS))
+    assert config.load_yaml(doc) == ruamel_yaml.YAML(typ='safe').load(doc)
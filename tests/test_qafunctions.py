@@ -0,0 +1,61 @@
+"""
+Tests for qa functions in sawyer.qafunctions
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sawyer import qafunctions as qaf
+
+
+def _stuck_sensor_df():
+    # Noisy values followed by a flat "stuck sensor" segment
+    rng = np.random.default_rng(0)
+    vals = np.concatenate([rng.normal(20, 5, 500), np.full(200, 17.3)])
+    idx = pd.date_range('2020-01-01', periods=len(vals), freq='30min')
+    return pd.DataFrame({'T': vals}, index=idx)
+
+@pytest.mark.parametrize('stat', ['mean', 'median', 'std'])
+@pytest.mark.parametrize('window', [1, 2, 5, 6])
+def test_rolling_stat_matches_pandas(stat, window):
+    s = _stuck_sensor_df()['T']
+    expected = s.rolling(window, center=True, min_periods=window - 1)
+    pd.testing.assert_series_equal(qaf._rolling_stat(s, stat, window),
+            getattr(expected, stat)(), check_exact=True, check_names=False)
+
+@pytest.mark.parametrize('comparison, thresh', [('equals', 0), ('above', 0)])
+def test_mask_by_rolling_stat_flat_segment(comparison, thresh):
+    df = _stuck_sensor_df()
+    idxrange = np.ones(len(df), dtype=bool)
+    colrange = np.ones(1, dtype=bool)
+    _, mask, _ = qaf.mask_by_rolling_stat(df, idxrange, colrange, 'T',
+            'mean', 5, comparison, thresh)
+    stat_ts = df['T'].rolling(5, center=True, min_periods=4).mean()
+    if comparison == 'equals':
+        expected = df['T'] == stat_ts
+    else:
+        expected = df['T'] > stat_ts + thresh
+    np.testing.assert_array_equal(mask['T'].to_numpy(), expected.to_numpy())
+
+@pytest.mark.parametrize('stat', ['mean', 'median', 'std'])
+def test_rolling_stat_series_shorter_than_window(stat):
+    s = pd.Series([1.0, 2.0])
+    assert qaf._rolling_stat(s, stat, 5).isna().all()
+
+@pytest.mark.parametrize('cval', ['x', '1'])
+def test_mask_by_comparison_equals_string_on_numeric(cval):
+    df = pd.DataFrame({'a': [1.0, 2.0, np.nan], 'b': [1, 2, 3]})
+    idxrange = np.ones(len(df), dtype=bool)
+    _, mask, _ = qaf.mask_by_comparison(df, idxrange, ['a', 'b'], 'equals',
+            cval)
+    assert not mask.to_numpy().any()
+
+def test_mask_by_comparison_equals_mixed_block():
+    df = pd.DataFrame({'a': [1.0, 2.0], 's': ['x', 'y']})
+    df['c'] = pd.Categorical(['x', 'z'])
+    idxrange = np.ones(len(df), dtype=bool)
+    _, mask, _ = qaf.mask_by_comparison(df, idxrange, ['a', 's', 'c'],
+            'equals', 'x')
+    np.testing.assert_array_equal(mask.to_numpy(),
+            [[False, True, True], [False, False, False]])